@@ -11,17 +11,40 @@ Architecture:
 """
 
 import json
+import math
 import time
 import os
-from datetime import datetime
+import sys
+import logging
+import threading
+from collections import OrderedDict, deque
+from array import array
 from typing import Optional, Dict, Any
+import numpy as np
 from web3 import Web3
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Demo-only sleeps that mimic bridge/settlement latency (off by default)
+SIMULATE_DELAYS = os.getenv('SIMULATE_DELAYS', '0') == '1'
+
+# 'live' talks to Polymarket / CCTP; 'simulated' uses fixed prices and mock bridging
+P402_MODE = os.getenv('P402_MODE', 'live')
+
+# Price returned by the oracle in simulated mode
+SIMULATED_PRICE = {
+    'market_id': 'simulated',
+    'yes_price': 0.50,
+    'no_price': 0.50,
+    'volume': 0,
+    'liquidity': 0
+}
+
 # Terminal colors for Matrix-style output
 class Colors:
     GREEN = '\033[92m'
@@ -32,17 +55,35 @@ class Colors:
     BOLD = '\033[1m'
     END = '\033[0m'
 
-def log(message: str, color: str = Colors.GREEN):
+# Colors only when attached to a terminal
+USE_COLOR = sys.stdout.isatty()
+
+logger = logging.getLogger("p402")
+_handler = logging.StreamHandler(sys.stdout)
+_handler.setFormatter(logging.Formatter("[%(asctime)s.%(msecs)03d] %(message)s", datefmt="%H:%M:%S"))
+logger.addHandler(_handler)
+logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+logger.propagate = False
+
+def log(message: str, color: str = Colors.GREEN, level: int = logging.INFO):
     """Matrix-style logging with timestamp"""
-    timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-    print(f"{color}[{timestamp}] {message}{Colors.END}")
+    logger.log(level, f"{color}{message}{Colors.END}" if USE_COLOR else message)
 
 def log_header(title: str):
     """Print section header"""
     border = "=" * 60
-    print(f"\n{Colors.CYAN}{Colors.BOLD}{border}")
-    print(f"  {title}")
-    print(f"{border}{Colors.END}\n")
+    if USE_COLOR:
+        print(f"\n{Colors.CYAN}{Colors.BOLD}{border}")
+        print(f"  {title}")
+        print(f"{border}{Colors.END}\n")
+    else:
+        print(f"\n{border}\n  {title}\n{border}\n")
+
+def _compact(column, keep):
+    """Return a copy of an array/bytearray column keeping rows where keep is True"""
+    if isinstance(column, bytearray):
+        return bytearray(np.frombuffer(column, dtype=np.uint8)[keep].tobytes())
+    return array(column.typecode, np.frombuffer(column, dtype=column.typecode)[keep].tobytes())
 
 
 class PolymarketOracle:
@@ -53,9 +94,36 @@ class PolymarketOracle:
     
     BASE_URL = "https://clob.polymarket.com"
     X402_FEE = 0.001  # USDC per data request
+    MARKETS_TTL = 5.0  # Seconds to reuse a fetched markets list
+    SLUG_CACHE_SIZE = 256  # Remembered slug -> question matches (LRU)
     
     def __init__(self):
         self.total_fees_paid = 0.0
+        
+        # Markets list cache: (markets, index) + monotonic fetch time
+        self._markets_cache = None
+        self._markets_cache_ts = 0.0
+        self._markets_ttl = self.MARKETS_TTL
+        # Slug -> matched question key, so repeat lookups skip the scan.
+        # Slugs come from on-chain events, so the map is a bounded LRU.
+        self._slug_to_key = OrderedDict()
+        
+        # Pick the price source once instead of branching on every call
+        if P402_MODE == 'simulated':
+            self.get_price = self._get_price_sim
+        else:
+            self.get_price = self._get_price_live
+        
+        # Shared keep-alive session (avoids a TCP+TLS handshake per request)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=16,
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip", "Connection": "keep-alive"})
+        
         log(f"🔮 Polymarket Oracle initialized", Colors.MAGENTA)
     
     def verify_payment(self) -> bool:
@@ -67,7 +135,30 @@ class PolymarketOracle:
         self.total_fees_paid += self.X402_FEE
         return True
     
-    def get_price(self, market_slug: str = "bitcoin-100k-2024") -> Optional[Dict[str, Any]]:
+    def _fetch_markets(self):
+        """
+        Download the markets list and build a lookup index
+        
+        Returns:
+            Tuple of (markets list, dict mapping lowercase question -> market)
+        """
+        response = self.session.get(f"{self.BASE_URL}/markets", timeout=(3, 10))
+        response.raise_for_status()
+        markets = response.json()
+        
+        index = {}
+        for m in markets or []:
+            # Skip if not a dictionary
+            if not isinstance(m, dict):
+                continue
+            
+            question = m.get('question', '') or m.get('title', '') or ''
+            # Keep the first market for duplicate questions (matches list order)
+            index.setdefault(question.lower(), m)
+        
+        return markets, index
+    
+    def _get_price_live(self, market_slug: str = "bitcoin-100k-2024") -> Optional[Dict[str, Any]]:
         """
         Fetch live market price from Polymarket
         
@@ -75,89 +166,80 @@ class PolymarketOracle:
             market_slug: Market identifier (e.g., "bitcoin-100k-2024")
             
         Returns:
-            Dict with market data or None on failure
+            Dict with market data or None if unpaid / not found
+            
+        Raises:
+            requests.RequestException: If the Polymarket API is unreachable
         """
         # x402: Verify payment before data access
         if not self.verify_payment():
             log("❌ x402: Payment verification failed", Colors.RED)
             return None
         
-        try:
-            # Fetch markets list
-            response = requests.get(f"{self.BASE_URL}/markets", timeout=10)
-            response.raise_for_status()
-            markets = response.json()
+        # Fetch markets list (reuse cached copy within TTL)
+        now = time.monotonic()
+        if self._markets_cache and now - self._markets_cache_ts < self._markets_ttl:
+            markets, index = self._markets_cache
+        else:
+            markets, index = self._fetch_markets()
+            self._markets_cache = (markets, index)
+            self._markets_cache_ts = now
+        
+        # Handle different response formats
+        if not markets:
+            log(f"⚠️  No markets returned from Polymarket", Colors.YELLOW)
+            return None
+        
+        # Find matching market (previous match, exact hit, then substring)
+        needle = market_slug.lower()
+        key = self._slug_to_key.get(needle)
+        if key is not None:
+            self._slug_to_key.move_to_end(needle)
+        market = index.get(key or needle)
+        if market is None:
+            key = next((key for key in index if needle in key), None)
+            if key is not None:
+                market = index[key]
+                self._slug_to_key[needle] = key
+                self._slug_to_key.move_to_end(needle)
+                if len(self._slug_to_key) > self.SLUG_CACHE_SIZE:
+                    self._slug_to_key.popitem(last=False)
+        
+        if market:
+            # Get price from tokens (YES token price)
+            tokens = market.get('tokens', [])
+            yes_price = 0.50  # Default
             
-            # Handle different response formats
-            if not markets:
-                log(f"⚠️  No markets returned from Polymarket", Colors.YELLOW)
-                return None
+            if tokens and len(tokens) > 0 and isinstance(tokens[0], dict):
+                # Polymarket prices are in $0.00-$1.00 range
+                yes_price = float(tokens[0].get('price', 0.50))
             
-            # Find matching market
-            market = None
-            for m in markets:
-                # Skip if not a dictionary
-                if not isinstance(m, dict):
-                    continue
-                    
-                question = m.get('question', '') or m.get('title', '') or ''
-                if market_slug.lower() in question.lower():
-                    market = m
-                    break
+            result = {
+                'market_id': market.get('condition_id', 'unknown'),
+                'question': market.get('question', market.get('title', 'Unknown')),
+                'yes_price': yes_price,
+                'no_price': 1.0 - yes_price,
+                'volume': float(market.get('volume', 0)),
+                'liquidity': float(market.get('liquidity', 0))
+            }
             
-            if market:
-                # Get price from tokens (YES token price)
-                tokens = market.get('tokens', [])
-                yes_price = 0.50  # Default
-                
-                if tokens and len(tokens) > 0 and isinstance(tokens[0], dict):
-                    # Polymarket prices are in $0.00-$1.00 range
-                    yes_price = float(tokens[0].get('price', 0.50))
-                
-                result = {
-                    'market_id': market.get('condition_id', 'unknown'),
-                    'question': market.get('question', market.get('title', 'Unknown')),
-                    'yes_price': yes_price,
-                    'no_price': 1.0 - yes_price,
-                    'volume': float(market.get('volume', 0)),
-                    'liquidity': float(market.get('liquidity', 0))
-                }
-                
-                log(f"📊 Polymarket: {result['question'][:50]}...", Colors.GREEN)
-                log(f"   YES: {yes_price*100:.1f}% | NO: {(1-yes_price)*100:.1f}% | Vol: ${result['volume']:,.0f}", Colors.CYAN)
-                
-                return result
-            else:
-                log(f"⚠️  Market '{market_slug}' not found on Polymarket", Colors.YELLOW)
-                log(f"   Using simulated prices (YES: 50%, NO: 50%)", Colors.YELLOW)
-                
-                # Return simulated data
-                return {
-                    'market_id': 'simulated',
-                    'question': market_slug,
-                    'yes_price': 0.50,
-                    'no_price': 0.50,
-                    'volume': 0,
-                    'liquidity': 0
-                }
-                
-        except requests.RequestException as e:
-            log(f"❌ Polymarket API Error: {str(e)}", Colors.RED)
-            log(f"   Using simulated prices (YES: 50%, NO: 50%)", Colors.YELLOW)
+            log(f"📊 Polymarket: {result['question'][:50]}...", Colors.GREEN)
+            log(f"   YES: {yes_price*100:.1f}% | NO: {(1-yes_price)*100:.1f}% | Vol: ${result['volume']:,.0f}", Colors.CYAN)
             
-            # Return simulated data on error
-            return {
-                'market_id': 'simulated',
-                'question': market_slug,
-                'yes_price': 0.50,
-                'no_price': 0.50,
-                'volume': 0,
-                'liquidity': 0
-            }
-        except Exception as e:
-            log(f"❌ Unexpected error: {str(e)}", Colors.RED)
+            return result
+        else:
+            log(f"⚠️  Market '{market_slug}' not found on Polymarket", Colors.YELLOW)
             return None
     
+    def _get_price_sim(self, market_slug: str = "bitcoin-100k-2024") -> Optional[Dict[str, Any]]:
+        """Simulated price source (P402_MODE=simulated): fixed 50/50 market"""
+        # x402: Verify payment before data access
+        if not self.verify_payment():
+            log("❌ x402: Payment verification failed", Colors.RED)
+            return None
+        
+        return {**SIMULATED_PRICE, 'question': market_slug}
+    
     def get_stats(self) -> Dict[str, float]:
         """Get oracle statistics"""
         return {
@@ -238,7 +320,8 @@ class HedgeManager:
         log(f"   Purpose:     Polymarket Hedge Trade", Colors.CYAN)
         
         # Simulate bridge delay
-        time.sleep(1)
+        if SIMULATE_DELAYS:
+            time.sleep(1)
         
         log(f"✅ Bridge simulation complete!", Colors.GREEN)
         log(f"   Next: Execute offsetting trade on Polymarket", Colors.YELLOW)
@@ -259,6 +342,13 @@ class ArcListener:
     Monitors SignalVault contract for user trades
     """
     
+    USDC_DECIMALS = 6  # CCTP / ERC-20 USDC amounts
+    COLLATERAL_DECIMALS = 18  # Arc native USDC, as sent by the frontend (parseEther)
+    GAS_PRICE_TTL = 12.0  # Seconds (~one block) to reuse a fetched gas price
+    DEFAULT_GAS_LIMIT = 200_000  # depositForBurn fallback when estimation fails
+    INT64_MAX = 2**63 - 1  # Event ids / leverage are uint256; columns are int64
+    SEEN_LOGS = 4096  # Recent (block, logIndex) kept to dedupe replayed ranges
+    
     def __init__(self, w3: Web3, contract_address: str, contract_abi: list, 
                  oracle: PolymarketOracle, hedge_manager: HedgeManager):
         self.w3 = w3
@@ -266,11 +356,126 @@ class ArcListener:
         self.oracle = oracle
         self.hedge_manager = hedge_manager
         self.trades_processed = 0
-        self.active_positions = []
+        
+        # Active synthetic positions, stored column-wise (struct-of-arrays)
+        self._pos_ids = array('q')
+        self._pos_entries = array('d')
+        self._pos_leverages = array('q')
+        self._pos_sides = bytearray()  # 1 = YES, 0 = NO
+        self._pos_markets = []
+        self._pos_amounts = array('d')
+        self._pos_timestamps = array('d')
+        self.position_lock = threading.Lock()  # Shared with liquidation monitor
         self.latest_bridge_tx = None  # Store latest bridge TX hash
+        
+        # Pick the bridge implementation once instead of per trade
+        self._bridge = self._mock_bridge if P402_MODE == 'simulated' else self._do_cctp_bridge
+        
+        # JSON-RPC batching is only available on newer web3.py releases
+        self._supports_batch = hasattr(self.w3, 'batch_requests')
+        
+        # PositionOpened event bound once; reused to decode every raw log
+        self._event = self.contract.events.PositionOpened()
+        
+        # Precomputed PositionOpened topic for log filters / eth_getLogs
+        self._topic0 = Web3.to_hex(self.w3.keccak(
+            text="PositionOpened(uint256,string,bool,uint256,uint256,uint256,address)"
+        ))
+        self._log_filter = None  # Long-lived eth_newFilter, created in listen()
+        self._filters_supported = True
+        
+        # Frontend-visible bridge TX file (directory created once)
+        self._public_dir = os.path.join(os.path.dirname(__file__), '..', 'public')
+        os.makedirs(self._public_dir, exist_ok=True)
+        self._bridge_tx_path = os.path.join(self._public_dir, 'latest_bridge_tx.json')
+        
+        # Agent signing account, derived once from the private key
+        self._private_key = os.getenv('AGENT_PRIVATE_KEY')
+        if self._private_key:
+            self._account = self.w3.eth.account.from_key(self._private_key)
+            self._wallet = self._account.address
+            # Same address on Polygon as on Arc, as bytes32 (for CCTP)
+            self._recipient_bytes32 = bytes.fromhex(self._wallet[2:].zfill(64))
+        else:
+            self._account = None
+            self._wallet = None
+            self._recipient_bytes32 = None
+        self._nonce = None  # Tracked locally after the first RPC lookup
+        self._gas_price = 0
+        self._gas_price_ts = 0.0
+        
+        # CCTP constants, checksummed once for all spot trades
+        self._messenger_addr = Web3.to_checksum_address(
+            os.getenv('ARC_TOKEN_MESSENGER', '0x8FE6B999Dc680CcFDD5Bf7EB0974218be2542DAA')
+        )
+        self._usdc_addr = Web3.to_checksum_address(
+            os.getenv('ARC_USDC_ADDRESS', '0x3600000000000000000000000000000000000000')
+        )
+        self._polygon_domain = int(os.getenv('POLYGON_DOMAIN_ID', '7'))
+        
+        # TokenMessenger contract
+        abi_path = os.path.join(os.path.dirname(__file__), 'TokenMessenger.json')
+        try:
+            with open(abi_path, 'r') as f:
+                self._tm_abi = json.load(f)
+            self._messenger = self.w3.eth.contract(address=self._messenger_addr, abi=self._tm_abi)
+        except FileNotFoundError:
+            self._tm_abi = None
+            self._messenger = None
+        
+        # depositForBurn gas limit, estimated once rather than per trade
+        self._gas_limit = self._estimate_gas_limit()
         log(f"👂 Arc Listener initialized", Colors.MAGENTA)
         log(f"   Contract: {contract_address}", Colors.CYAN)
     
+    def _rpc_batch(self, *calls):
+        """
+        Execute RPC calls in a single JSON-RPC batch when supported
+        
+        Args:
+            calls: Zero-argument callables, each issuing one RPC request
+            
+        Returns:
+            List of results in call order
+        """
+        if self._supports_batch:
+            with self.w3.batch_requests() as batch:
+                for call in calls:
+                    batch.add(call())
+                return batch.execute()
+        
+        return [call() for call in calls]
+    
+    def _estimate_gas_limit(self) -> int:
+        """
+        Estimate depositForBurn gas with a representative 1 USDC transfer
+        
+        Returns:
+            Estimate plus a 20% buffer, or DEFAULT_GAS_LIMIT if it can't be estimated
+        """
+        if self._messenger is None or not self._account:
+            return self.DEFAULT_GAS_LIMIT
+        
+        try:
+            estimate = self._messenger.functions.depositForBurn(
+                10**self.USDC_DECIMALS,
+                self._polygon_domain,
+                self._recipient_bytes32,
+                self._usdc_addr
+            ).estimate_gas({'from': self._wallet})
+            return int(estimate * 1.2)
+        except Exception as e:
+            log(f"⚠️  Gas estimation failed, using {self.DEFAULT_GAS_LIMIT}: {e}", Colors.YELLOW)
+            return self.DEFAULT_GAS_LIMIT
+    
+    def _get_gas_price(self) -> int:
+        """Gas price, refreshed from the node at most once per GAS_PRICE_TTL"""
+        now = time.monotonic()
+        if now - self._gas_price_ts > self.GAS_PRICE_TTL:
+            self._gas_price = self.w3.eth.gas_price
+            self._gas_price_ts = now
+        return self._gas_price
+    
     def handle_spot_execution(self, market_id: str, amount: float, side: str):
         """
         Handle Spot Trade (1x Leverage)
@@ -279,59 +484,52 @@ class ArcListener:
         log(f"🔄 SPOT TRADE DETECTED (1x Leverage)", Colors.CYAN)
         log(f"   Initiating Circle CCTP Bridge to Polygon...", Colors.MAGENTA)
         
+        self._bridge(market_id, amount, side)
+    
+    def _do_cctp_bridge(self, market_id: str, amount: float, side: str):
+        """Bridge USDC to Polygon with Circle CCTP depositForBurn"""
         try:
-            # Load TokenMessenger contract
-            token_messenger_address = os.getenv('ARC_TOKEN_MESSENGER', '0x8FE6B999Dc680CcFDD5Bf7EB0974218be2542DAA')
-            usdc_address = os.getenv('ARC_USDC_ADDRESS', '0x3600000000000000000000000000000000000000')
-            polygon_domain = int(os.getenv('POLYGON_DOMAIN_ID', '7'))
-            
-            # Load ABI
-            abi_path = os.path.join(os.path.dirname(__file__), 'TokenMessenger.json')
-            with open(abi_path, 'r') as f:
-                token_messenger_abi = json.load(f)
-            
-            messenger = self.w3.eth.contract(
-                address=Web3.to_checksum_address(token_messenger_address),
-                abi=token_messenger_abi
-            )
+            # TokenMessenger contract is loaded once in __init__
+            if self._messenger is None:
+                raise FileNotFoundError('TokenMessenger.json')
             
-            # Get wallet address from private key
-            private_key = os.getenv('AGENT_PRIVATE_KEY')
-            if not private_key:
+            # Agent account is derived once in __init__
+            if not self._account:
                 log("❌ AGENT_PRIVATE_KEY not found in .env", Colors.RED)
                 return
             
-            account = self.w3.eth.account.from_key(private_key)
-            wallet_address = account.address
-            
             # Convert amount to USDC decimals (6 decimals)
-            amount_usdc = int(amount * 10**6)
-            
-            # Convert recipient address to bytes32 (for CCTP)
-            # Using same address on Polygon as on Arc
-            recipient_bytes32 = bytes.fromhex(wallet_address[2:].zfill(64))
+            amount_usdc = int(amount * 10**self.USDC_DECIMALS)
             
             log(f"   Amount: {amount} USDC ({amount_usdc} units)", Colors.CYAN)
-            log(f"   From: {wallet_address[:10]}...{wallet_address[-8:]}", Colors.CYAN)
-            log(f"   Destination: Polygon (Domain {polygon_domain})", Colors.CYAN)
+            log(f"   From: {self._wallet[:10]}...{self._wallet[-8:]}", Colors.CYAN)
+            log(f"   Destination: Polygon (Domain {self._polygon_domain})", Colors.CYAN)
             
-            # Build transaction
-            tx = messenger.functions.depositForBurn(
+            # Build transaction (nonce is only fetched from the chain once)
+            if self._nonce is None:
+                self._nonce, self._gas_price = self._rpc_batch(
+                    lambda: self.w3.eth.get_transaction_count(self._wallet),
+                    lambda: self.w3.eth.gas_price
+                )
+                self._gas_price_ts = time.monotonic()
+            gas_price = self._get_gas_price()
+            tx = self._messenger.functions.depositForBurn(
                 amount_usdc,
-                polygon_domain,
-                recipient_bytes32,
-                Web3.to_checksum_address(usdc_address)
+                self._polygon_domain,
+                self._recipient_bytes32,
+                self._usdc_addr
             ).build_transaction({
-                'from': wallet_address,
-                'nonce': self.w3.eth.get_transaction_count(wallet_address),
-                'gas': 200000,  # Estimated gas limit
-                'gasPrice': self.w3.eth.gas_price,
+                'from': self._wallet,
+                'nonce': self._nonce,
+                'gas': self._gas_limit,  # Estimated once at startup
+                'gasPrice': gas_price,
             })
             
             # Sign and send transaction
             log(f"   Signing and broadcasting CCTP bridge transaction...", Colors.YELLOW)
-            signed_tx = self.w3.eth.account.sign_transaction(tx, private_key)
+            signed_tx = self.w3.eth.account.sign_transaction(tx, self._private_key)
             tx_hash = self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            self._nonce += 1
             
             log(f"✅ Bridge TX Submitted: {tx_hash.hex()}", Colors.GREEN)
             log(f"   Waiting for confirmation...", Colors.YELLOW)
@@ -351,49 +549,73 @@ class ArcListener:
                 # Store bridge TX hash for frontend
                 self.latest_bridge_tx = tx_hash.hex()
                 # Write to file for frontend to read (in public directory)
+                # Written to a temp file and swapped in so readers never see a partial file
                 try:
-                    public_dir = os.path.join(os.path.dirname(__file__), '..', 'public')
-                    os.makedirs(public_dir, exist_ok=True)
-                    with open(os.path.join(public_dir, 'latest_bridge_tx.json'), 'w') as f:
+                    tmp_path = self._bridge_tx_path + '.tmp'
+                    with open(tmp_path, 'w') as f:
                         json.dump({'tx_hash': self.latest_bridge_tx, 'timestamp': time.time()}, f)
+                    os.replace(tmp_path, self._bridge_tx_path)
                 except Exception as e:
                     log(f"Warning: Could not write bridge TX to file: {e}", Colors.YELLOW)
             else:
                 log(f"❌ Bridge transaction failed", Colors.RED)
                 log(f"   TX: {tx_hash.hex()}\n", Colors.RED)
+                # Limit may be stale (e.g. contract upgrade); re-estimate for next trade
+                self._gas_limit = self._estimate_gas_limit()
                 
         except FileNotFoundError:
             log(f"❌ TokenMessenger.json ABI not found", Colors.RED)
             log(f"   Falling back to simulation...\n", Colors.YELLOW)
-            time.sleep(2)
-            log(f"✅ Asset Bridged & Purchased on Polygon (Simulated)", Colors.GREEN)
-            log(f"   Market: {market_id} | Side: {side} | Amount: {amount} USDC\n", Colors.GREEN)
+            self._mock_bridge(market_id, amount, side)
         except Exception as e:
+            self._nonce = None  # Resync nonce from chain on next trade
             log(f"❌ CCTP Bridge Error: {str(e)}", Colors.RED)
             log(f"   Falling back to simulation...\n", Colors.YELLOW)
+            self._mock_bridge(market_id, amount, side)
+    
+    def _mock_bridge(self, market_id: str, amount: float, side: str):
+        """Simulated bridge + purchase (P402_MODE=simulated, or live fallback)"""
+        if SIMULATE_DELAYS:
             time.sleep(2)
-            log(f"✅ Asset Bridged & Purchased on Polygon (Simulated)", Colors.GREEN)
-            log(f"   Market: {market_id} | Side: {side} | Amount: {amount} USDC\n", Colors.GREEN)
+        log(f"✅ Asset Bridged & Purchased on Polygon (Simulated)", Colors.GREEN)
+        log(f"   Market: {market_id} | Side: {side} | Amount: {amount} USDC\n", Colors.GREEN)
 
     def handle_synthetic_execution(self, position_id: int, market_id: str, amount: float, leverage: int, entry_price: int, side: str):
         """
         Handle Leverage Trade (>1x Leverage)
         Action: Keep funds on Arc, act as Oracle, track for liquidation
+        
+        Raises:
+            ValueError: If a field does not fit the position columns
         """
+        # Convert everything up front so the columns are appended all-or-nothing
+        position_id, leverage = int(position_id), int(leverage)
+        if not 0 <= position_id <= self.INT64_MAX:
+            raise ValueError(f"positionId {position_id} out of range")
+        if not 1 <= leverage <= self.INT64_MAX:
+            raise ValueError(f"leverage {leverage} out of range")
+        try:
+            entry_price, amount = float(entry_price), float(amount)
+        except OverflowError:
+            raise ValueError("entryPrice/collateral out of range")
+        if not (math.isfinite(entry_price) and math.isfinite(amount)):
+            raise ValueError("entryPrice/collateral must be finite")
+        is_yes = 1 if side == 'YES' else 0
+        opened_at = time.time()
+        
         log(f"⚡ LEVERAGE TRADE DETECTED ({leverage}x Leverage)", Colors.YELLOW)
         log(f"   Synthetic Execution: No Bridging Required", Colors.YELLOW)
         log(f"   Tracking Position #{position_id} for Liquidation Risk...", Colors.MAGENTA)
         
-        # Add to tracking list
-        self.active_positions.append({
-            'id': position_id,
-            'market_id': market_id,
-            'amount': amount,
-            'leverage': leverage,
-            'entry_price': entry_price,
-            'side': side,
-            'timestamp': time.time()
-        })
+        # Add to tracking columns
+        with self.position_lock:
+            self._pos_ids.append(position_id)
+            self._pos_entries.append(entry_price)
+            self._pos_leverages.append(leverage)
+            self._pos_sides.append(is_yes)
+            self._pos_markets.append(market_id)
+            self._pos_amounts.append(amount)
+            self._pos_timestamps.append(opened_at)
         
         log(f"✅ Position #{position_id} Active | Entry: {entry_price} | Liq Price: Calculating...\n", Colors.GREEN)
 
@@ -402,56 +624,99 @@ class ArcListener:
         Check active positions for liquidation conditions
         Liquidation Threshold: -80% PnL
         """
-        if not self.active_positions:
-            return
+        with self.position_lock:
+            if not self._pos_ids:
+                return
+            ids = np.frombuffer(self._pos_ids, dtype=np.int64).copy()
+            entries = np.frombuffer(self._pos_entries, dtype=np.float64).copy()
+            leverages = np.frombuffer(self._pos_leverages, dtype=np.int64).copy()
+            sides = np.frombuffer(self._pos_sides, dtype=np.uint8).copy()
+            markets = list(self._pos_markets)
+        
+        count = len(ids)
 
         log_header("LIQUIDATION CHECK")
-        log(f"🔍 Checking {len(self.active_positions)} active positions...", Colors.CYAN)
+        log(f"🔍 Checking {count} active positions...", Colors.CYAN)
         
-        positions_to_remove = []
-        
-        for pos in self.active_positions:
-            # Fetch current price
-            price_data = self.oracle.get_price(pos['market_id'])
-            if not price_data:
+        # Fetch each market's price once per round
+        price_by_market = {}
+        for market_id in dict.fromkeys(markets):
+            try:
+                price_data = self.oracle.get_price(market_id)
+            except Exception as e:
+                log(f"❌ Polymarket API Error: {str(e)}", Colors.RED)
                 continue
-                
-            current_price = price_data['yes_price'] * 100 if pos['side'] == 'YES' else price_data['no_price'] * 100
-            
-            # Calculate PnL
-            # PnL % = ((Current Price - Entry Price) / Entry Price) * Leverage
-            # Simplified for prediction markets (0-100 range):
-            price_diff = (current_price - pos['entry_price'])
-            pnl_percent = (price_diff / 100) * pos['leverage']
-            
-            # Invert PnL if Short/NO? 
-            # Actually, if I bought NO at 40 (Entry), and price goes to 30, I win.
-            # My logic above: current_price is the price of the asset I hold.
-            # If I hold NO, current_price is NO price. So logic holds.
-            
-            log(f"   Pos #{pos['id']} ({pos['side']} {pos['leverage']}x): Entry {pos['entry_price']:.1f} -> Curr {current_price:.1f} | PnL: {pnl_percent*100:.1f}%", Colors.CYAN)
+            if price_data:
+                price_by_market[market_id] = price_data
+        
+        # Price of the asset held (YES or NO); NaN if the market could not be priced
+        current = np.fromiter(
+            (price_by_market[m]['yes_price' if yes else 'no_price'] * 100 if m in price_by_market else np.nan
+             for m, yes in zip(markets, sides)),
+            dtype=np.float64, count=count
+        )
+        
+        # Calculate PnL for all positions at once
+        # PnL % = ((Current Price - Entry Price) / Entry Price) * Leverage
+        # Simplified for prediction markets (0-100 range).
+        # current is the price of the asset held, so the same formula
+        # covers both sides. Unpriced (NaN) rows never hit the threshold.
+        pnl = ((current - entries) / 100) * leverages
+        
+        # Per-position detail only when LOG_LEVEL=DEBUG
+        if logger.isEnabledFor(logging.DEBUG):
+            for i in np.flatnonzero(~np.isnan(current)):
+                side = 'YES' if sides[i] else 'NO'
+                log(f"   Pos #{ids[i]} ({side} {leverages[i]}x): Entry {entries[i]:.1f} -> Curr {current[i]:.1f} | PnL: {pnl[i]*100:.1f}%", Colors.CYAN, logging.DEBUG)
+        
+        # Check Threshold (-80%)
+        liquidated = np.flatnonzero(pnl <= -0.80)
+        for i in liquidated:
+            position_id = int(ids[i])
+            log(f"🚨 LIQUIDATION TRIGGERED for Position #{position_id}", Colors.RED)
+            log(f"   Reason: PnL {pnl[i]*100:.1f}% <= -80%", Colors.RED)
+            log(f"   Executing settlePosition({position_id})...", Colors.MAGENTA)
             
-            # Check Threshold (-80%)
-            if pnl_percent <= -0.80:
-                log(f"🚨 LIQUIDATION TRIGGERED for Position #{pos['id']}", Colors.RED)
-                log(f"   Reason: PnL {pnl_percent*100:.1f}% <= -80%", Colors.RED)
-                log(f"   Executing settlePosition({pos['id']})...", Colors.MAGENTA)
-                
-                # Simulate Contract Call
-                # self.contract.functions.settlePosition(pos['id']).transact(...)
+            # Simulate Contract Call
+            # self.contract.functions.settlePosition(position_id).transact(...)
+            if SIMULATE_DELAYS:
                 time.sleep(1)
-                
-                log(f"💀 Position #{pos['id']} LIQUIDATED", Colors.RED)
-                positions_to_remove.append(pos)
-        
-        # Remove liquidated positions
-        for pos in positions_to_remove:
-            self.active_positions.remove(pos)
             
-        if not positions_to_remove:
+            log(f"💀 Position #{position_id} LIQUIDATED", Colors.RED)
+        
+        # Remove liquidated positions in a single pass
+        if len(liquidated):
+            self._remove_positions(ids[liquidated])
+        else:
             log(f"✅ All positions safe", Colors.GREEN)
         print("")
 
+    def _remove_positions(self, position_ids: np.ndarray):
+        """Drop positions by id from every tracking column (mask compaction)"""
+        with self.position_lock:
+            keep = ~np.isin(np.frombuffer(self._pos_ids, dtype=np.int64), position_ids)
+            self._pos_ids = _compact(self._pos_ids, keep)
+            self._pos_entries = _compact(self._pos_entries, keep)
+            self._pos_leverages = _compact(self._pos_leverages, keep)
+            self._pos_sides = _compact(self._pos_sides, keep)
+            self._pos_markets = [m for m, k in zip(self._pos_markets, keep) if k]
+            self._pos_amounts = _compact(self._pos_amounts, keep)
+            self._pos_timestamps = _compact(self._pos_timestamps, keep)
+
+    def liquidation_monitor(self, interval: int = 10):
+        """
+        Background thread running liquidation checks on a fixed timer,
+        independent of the event polling loop
+        """
+        log("🛡️  Liquidation Monitor Started", Colors.MAGENTA)
+        
+        while True:
+            time.sleep(interval)
+            try:
+                self.check_liquidations()
+            except Exception as e:
+                log(f"❌ Liquidation monitor error: {e}", Colors.RED)
+
     def process_position_opened(self, event: Dict[str, Any]):
         """
         Process PositionOpened event from SignalVault
@@ -460,27 +725,14 @@ class ArcListener:
         
         log_header(f"NEW TRADE #{self.trades_processed}")
         
-        args = event['args']
-        position_id = args.get('positionId', 0)
-        user = args['trader']
-        market_id = args['marketId']
-        is_long_yes = args['isLongYes']
-        entry_price = args.get('entryPrice', 50)
-        collateral = args.get('collateral', 0)
-        leverage = args.get('leverage', 1)
-        
-        amount = float(self.w3.from_wei(collateral, 'mwei')) # USDC has 6 decimals usually, but let's check contract
-        # If contract uses 18 decimals for collateral, use 'ether'. If 6, use 'mwei'.
-        # Based on previous code, it seemed to treat it as ether (18), but USDC is usually 6.
-        # Let's stick to previous behavior or safer float conversion if unsure.
-        # Previous code: amount = self.w3.from_wei(event['args']['amount'], 'ether')
-        # But wait, the event arg name changed from 'amount' to 'collateral' in my new ABI?
-        # Let's check the ABI update below.
-        
-        # Correcting amount calculation based on standard USDC (6 decimals) or 18 if test token
-        # For safety in this demo, we'll assume 18 if previous code worked, or adjust.
-        # Actually, let's use the value directly if it's already a number or convert safely.
-        amount_fmt = float(collateral) / 10**18 if collateral > 10**10 else float(collateral) / 10**6
+        # Decoder always returns every ABI field, so read them directly
+        a = event.args
+        position_id, user, market_id, is_long_yes, entry_price, collateral, leverage = (
+            a.positionId, a.trader, a.marketId, a.isLongYes, a.entryPrice, a.collateral, a.leverage
+        )
+        
+        # Collateral is Arc native USDC (18 decimals)
+        amount_fmt = collateral / 10**self.COLLATERAL_DECIMALS
         
         side = "YES" if is_long_yes else "NO"
         color = Colors.GREEN if is_long_yes else Colors.RED
@@ -498,6 +750,72 @@ class ArcListener:
             self.handle_synthetic_execution(position_id, market_id, amount_fmt, leverage, entry_price, side)
             
     
+    @staticmethod
+    def _is_unsupported_method(error: Exception) -> bool:
+        """True if an RPC error means the node does not implement the method"""
+        detail = error.args[0] if error.args else error
+        if isinstance(detail, dict):
+            if detail.get('code') == -32601:
+                return True
+            detail = detail.get('message', '')
+        message = str(detail).lower()
+        return any(s in message for s in (
+            'method not found', 'not supported', 'does not exist', 'not available'
+        ))
+    
+    def _fetch_new_logs(self, from_block: int):
+        """
+        Fetch PositionOpened logs not yet returned
+        
+        Uses a long-lived eth_newFilter so idle polls return an empty diff,
+        recreating it from from_block if the node drops it. Nodes without
+        filter support fall back to an eth_getLogs range scan.
+        
+        Returns:
+            Tuple of (raw logs, block to resume range scans from, whether the
+            logs may repeat ones already returned)
+        """
+        if self._log_filter is not None:
+            try:
+                # A filter diff is authoritative and never replays, but the
+                # node may still deliver logs for blocks <= head later, so a
+                # recreated filter re-scans from head inclusive
+                head = self.w3.eth.block_number
+                return self._log_filter.get_new_entries(), head, False
+            except Exception as e:
+                log(f"⚠️  Log filter lost ({e}), recreating...", Colors.YELLOW)
+                self._log_filter = None
+        
+        if self._filters_supported:
+            try:
+                head = self.w3.eth.block_number
+                self._log_filter = self.w3.eth.filter({
+                    'address': self.contract.address,
+                    'topics': [self._topic0],
+                    'fromBlock': from_block
+                })
+                # Backfill anything since from_block, then poll for diffs
+                return self._log_filter.get_all_entries(), head, True
+            except Exception as e:
+                self._log_filter = None
+                if not self._is_unsupported_method(e):
+                    raise  # Transient: retry the filter on the next poll
+                log(f"⚠️  eth_newFilter unavailable ({e}), using eth_getLogs", Colors.YELLOW)
+                self._filters_supported = False
+        
+        # Block number + logs in one round trip
+        current_block, raw_logs = self._rpc_batch(
+            lambda: self.w3.eth.block_number,
+            lambda: self.w3.eth.get_logs({
+                'address': self.contract.address,
+                'topics': [self._topic0],
+                'fromBlock': from_block,
+                'toBlock': 'latest'
+            })
+        )
+        # Anything past current_block is picked up again on the next poll
+        return [raw for raw in raw_logs if raw['blockNumber'] <= current_block], current_block + 1, True
+    
     def listen(self, poll_interval: int = 2):
         """
         Main event listening loop
@@ -507,34 +825,40 @@ class ArcListener:
         log(f"🎯 Listening for PositionOpened events...", Colors.GREEN)
         log(f"⏱️  Poll interval: {poll_interval}s\n", Colors.CYAN)
         
-        last_check_time = time.time()
-        last_processed_block = self.w3.eth.block_number
+        # Liquidations run on their own thread so slow oracle calls
+        # never delay event polling
+        monitor_thread = threading.Thread(target=self.liquidation_monitor, daemon=True)
+        monitor_thread.start()
+        
+        # First block a range scan (filter backfill / eth_getLogs) starts from
+        next_block = self.w3.eth.block_number + 1
+        # Recently handled logs, so overlapping range scans don't replay them
+        seen_order = deque()
+        seen = set()
         
         while True:
             try:
-                current_block = self.w3.eth.block_number
+                raw_logs, resume_block, replayed = self._fetch_new_logs(next_block)
                 
-                # Scan last 10 blocks to catch any missed events
-                from_block = max(last_processed_block - 10, 0)
-                
-                # Get events from recent blocks
-                events = self.contract.events.PositionOpened.get_logs(
-                    from_block=from_block,
-                    to_block=current_block
-                )
-                
-                # Process new events (avoid duplicates)
-                for event in events:
-                    event_block = event['blockNumber']
-                    if event_block > last_processed_block:
+                for raw in raw_logs:
+                    log_pos = (raw['blockNumber'], raw['logIndex'])
+                    if log_pos in seen:
+                        if replayed:
+                            continue
+                    else:
+                        seen.add(log_pos)
+                        seen_order.append(log_pos)
+                        if len(seen_order) > self.SEEN_LOGS:
+                            seen.discard(seen_order.popleft())
+                    try:
+                        event = self._event.process_log(raw)
                         self.process_position_opened(event)
+                    except Exception as e:
+                        # Skip a bad event instead of retrying it every poll
+                        log(f"❌ Skipping log {log_pos}: {e}", Colors.RED)
                 
-                last_processed_block = current_block
-                
-                # Check Liquidations every 10 seconds
-                if time.time() - last_check_time > 10:
-                    self.check_liquidations()
-                    last_check_time = time.time()
+                # Advance past quiet blocks so a recreated filter starts near head
+                next_block = max(next_block, resume_block)
                 
                 # Periodic health check
                 if self.trades_processed % 10 == 0 and self.trades_processed > 0:
@@ -607,7 +931,13 @@ def main():
     
     # Connect to Arc Network
     log(f"🔗 Connecting to Arc Testnet...", Colors.YELLOW)
-    w3 = Web3(Web3.HTTPProvider(RPC_URL))
+    rpc_session = requests.Session()
+    rpc_session.mount("https://", HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=8,
+        max_retries=Retry(total=3, backoff_factor=0.3)
+    ))
+    w3 = Web3(Web3.HTTPProvider(RPC_URL, session=rpc_session, request_kwargs={"timeout": 15}))
     
     if w3.is_connected():
         log(f"✅ Connected to Arc Network", Colors.GREEN)
@@ -624,7 +954,10 @@ def main():
     
     # Test oracle with sample market
     log_header("ORACLE TEST")
-    oracle.get_price("bitcoin-100k-2024")
+    try:
+        oracle.get_price("bitcoin-100k-2024")
+    except Exception as e:
+        log(f"❌ Polymarket API Error: {str(e)}", Colors.RED)
     
     # Start listening
     listener.listen(poll_interval=2)
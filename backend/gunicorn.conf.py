@@ -0,0 +1,32 @@
+"""
+Gunicorn config for the webhook agent
+Run with: gunicorn -c gunicorn.conf.py webhook_agent:app
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Config is read before the app is imported, so pick up .env here too
+load_dotenv()
+
+bind = "0.0.0.0:5001"
+
+# Positions live in process memory, so exactly one worker owns them;
+# gevent lets that worker multiplex many connections cooperatively
+workers = 1
+worker_class = "gevent"
+worker_connections = 1000
+keepalive = 75
+
+# Optional TLS so a remote frontend reuses one encrypted keep-alive
+# connection instead of paying a handshake per webhook
+certfile = os.getenv('TLS_CERTFILE') or None
+keyfile = os.getenv('TLS_KEYFILE') or None
+
+def post_worker_init(worker):
+    # __main__ never runs under gunicorn, so the monitor is started here,
+    # inside the (gevent-patched) worker rather than the master
+    from webhook_agent import print_banner, start_monitor, log, Colors
+    print_banner()
+    log(f"📡 Listening on {'https' if certfile else 'http'}://{bind}", Colors.CYAN)
+    start_monitor()
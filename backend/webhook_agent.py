@@ -4,23 +4,486 @@ Protocol 402 - Webhook-Based Leverage System
 Fast & Simple approach using Flask API
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
 from flask_cors import CORS
+from flask.json.provider import JSONProvider
 import threading
 import time
-import requests
-from datetime import datetime
+import sys
+import logging
+import heapq
+import itertools
+import orjson
+from queue import SimpleQueue, Empty
 import os
+import math
+from dataclasses import dataclass, replace
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Tuple
+import numpy as np
 from dotenv import load_dotenv
 
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; the NumPy kernel is used instead
+    njit = None
+
 load_dotenv()
 
+class OrjsonProvider(JSONProvider):
+    """Route Flask's JSON handling (request.json, jsonify) through orjson"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)  # Allow frontend to call API
 
-# In-memory position storage
-active_positions = []
-position_lock = threading.Lock()
+def ojson(obj, status: int = 200) -> Response:
+    """JSON response serialized with orjson (C extension) instead of jsonify"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+# In-memory position storage lives in `positions` (PositionStore below).
+# Owned by the liquidation monitor thread: HTTP handlers never touch it
+# directly, they enqueue ('add', position) / ('remove', position_id) ops.
+pending_ops: SimpleQueue = SimpleQueue()
+
+# Immutable view for readers, republished by the monitor only when the
+# state generation changed (position dicts are never mutated once stored)
+positions_snapshot: Tuple[dict, ...] = ()
+_generation = 0
+_published_generation = 0
+
+# Set by handlers after enqueueing so the monitor reacts immediately
+wake_event = threading.Event()
+CHECK_INTERVAL = 10  # Seconds between price re-checks of open positions
+
+# Upper bound on tracked positions. Handlers take a slot before queueing an
+# add and answer 429 when none is left; the monitor returns it on removal.
+MAX_POSITIONS = int(os.getenv('MAX_POSITIONS', '100000'))
+position_slots = threading.BoundedSemaphore(MAX_POSITIONS)
+
+# Optional Redis persistence (REDIS_URL): positions survive restarts and can
+# be inspected by other processes. Written only by the monitor thread.
+REDIS_URL = os.getenv('REDIS_URL')
+REDIS_KEY = os.getenv('REDIS_POSITIONS_KEY', 'fulcrum:positions')
+redis_client = None
+if REDIS_URL:
+    import redis
+    # One client = one shared connection pool for the whole process
+    redis_client = redis.Redis.from_url(REDIS_URL, max_connections=64)
+
+
+def store_position(position: 'Position'):
+    """Persist an open position to Redis (no-op without REDIS_URL)"""
+    if redis_client is None:
+        return
+    try:
+        redis_client.hset(REDIS_KEY, str(position.id), orjson.dumps(position))
+    except Exception as e:
+        log(f"⚠️  Redis write failed for position #{position.id}: {e}", Colors.YELLOW)
+
+def drop_position(position_id):
+    """Remove a position from Redis (no-op without REDIS_URL)"""
+    if redis_client is None:
+        return
+    try:
+        redis_client.hdel(REDIS_KEY, str(position_id))
+    except Exception as e:
+        log(f"⚠️  Redis delete failed for position #{position_id}: {e}", Colors.YELLOW)
+
+def restore_positions():
+    """Queue positions persisted in Redis so the monitor tracks them again"""
+    if redis_client is None:
+        return
+    try:
+        stored = redis_client.hvals(REDIS_KEY)
+    except Exception as e:
+        log(f"⚠️  Could not restore positions from Redis: {e}", Colors.YELLOW)
+        return
+    
+    restored = 0
+    for i, raw in enumerate(stored):
+        try:
+            position = Position.from_record(orjson.loads(raw))
+        except (KeyError, TypeError, ValueError) as e:
+            log(f"⚠️  Skipping malformed stored position: {e}", Colors.YELLOW)
+            continue
+        if not position_slots.acquire(blocking=False):
+            log(f"⚠️  MAX_POSITIONS reached, skipped {len(stored) - i} stored positions", Colors.YELLOW)
+            break
+        pending_ops.put(('restore', position))
+        restored += 1
+    if restored:
+        wake_event.set()
+        log(f"♻️  Restored {restored} positions from Redis", Colors.CYAN)
+
+
+class PositionStore:
+    """
+    Open positions packed into one preallocated numpy recarray
+    Each position occupies a slot (~50 B of contiguous fields instead of a
+    dict of boxed floats); freed slots are recycled via a free-list and
+    id_to_slot gives O(1) lookup. Market ids are opaque client keys (the
+    frontend sends the market title), so the array holds an interned
+    category code, refcounted per slot and recycled once its last position
+    is gone; only those keys and the trader address live outside it.
+    """
+    
+    DTYPE = np.dtype([
+        ('id', 'u8'),
+        ('market_code', 'u4'),   # Index into market_keys
+        ('sign', 'i1'),          # 1 = long YES, -1 = long NO, 0 = free slot
+        ('entry_price', 'f8'),
+        ('leverage', 'f8'),
+        ('liq_price', 'f8'),
+        ('collateral', 'f8'),
+        ('timestamp', 'f8'),
+    ])
+    MAX_ID = int(np.iinfo(np.uint64).max)  # Position ids must fit the 'id' column
+    
+    def __init__(self, capacity: int = 1024, max_capacity: int = None):
+        self.max_capacity = max_capacity
+        self.rows = np.zeros(capacity, dtype=self.DTYPE).view(np.recarray)
+        self.traders: list = [None] * capacity
+        self.free: list = list(range(capacity - 1, -1, -1))
+        self.id_to_slot: Dict[int, int] = {}
+        self.market_codes: Dict[Any, int] = {}
+        self.market_keys: list = []  # code -> market key (None when free)
+        self.market_refs: list = []  # code -> live slots using it
+        self.free_codes: list = []
+    
+    def __len__(self):
+        return len(self.id_to_slot)
+    
+    def __contains__(self, position_id):
+        return position_id in self.id_to_slot
+    
+    def _grow(self):
+        old = len(self.rows)
+        new = old * 2 if self.max_capacity is None else min(old * 2, self.max_capacity)
+        if new == old:
+            raise RuntimeError("position store is full")
+        rows = np.zeros(new, dtype=self.DTYPE).view(np.recarray)
+        rows[:old] = self.rows
+        self.rows = rows
+        self.traders.extend([None] * (new - old))
+        self.free.extend(range(new - 1, old - 1, -1))
+    
+    def _acquire_code(self, market_id) -> int:
+        code = self.market_codes.get(market_id)
+        if code is None:
+            if self.free_codes:
+                code = self.free_codes.pop()
+                self.market_keys[code] = market_id
+            else:
+                code = len(self.market_keys)
+                self.market_keys.append(market_id)
+                self.market_refs.append(0)
+            self.market_codes[market_id] = code
+        self.market_refs[code] += 1
+        return code
+    
+    def _release_code(self, code: int):
+        self.market_refs[code] -= 1
+        if not self.market_refs[code]:
+            del self.market_codes[self.market_keys[code]]
+            self.market_keys[code] = None
+            self.free_codes.append(code)
+    
+    def add(self, position: 'Position') -> int:
+        """Write a position into a slot (reusing its slot if already stored)"""
+        slot = self.id_to_slot.get(position.id)
+        is_new = slot is None
+        if is_new:
+            if not self.free:
+                self._grow()
+            slot = self.free.pop()
+        else:
+            old_code = int(self.rows.market_code[slot])
+        
+        code = self._acquire_code(position.market_id)
+        try:
+            self.rows[slot] = (
+                position.id,
+                code,
+                1 if position.is_long_yes else -1,
+                position.entry_price,
+                position.leverage,
+                position.liq_price,
+                position.collateral,
+                position.timestamp,
+            )
+        except Exception:
+            self._release_code(code)
+            if is_new:
+                self.free.append(slot)
+            raise
+        if not is_new:
+            self._release_code(old_code)
+        # Only map the id once its row is written, so a bad row is never visible
+        if is_new:
+            self.id_to_slot[position.id] = slot
+        self.traders[slot] = position.trader
+        return slot
+    
+    def remove(self, position_id) -> bool:
+        """Free a position's slot; False if it was not stored"""
+        slot = self.id_to_slot.pop(position_id, None)
+        if slot is None:
+            return False
+        self.rows.sign[slot] = 0
+        self._release_code(int(self.rows.market_code[slot]))
+        self.traders[slot] = None
+        self.free.append(slot)
+        return True
+    
+    def row(self, position_id):
+        """Record for an open position (a view into the array)"""
+        return self.rows[self.id_to_slot[position_id]]
+    
+    def to_dicts(self) -> Tuple[dict, ...]:
+        """Materialize open positions as API dicts"""
+        slots = list(self.id_to_slot.values())
+        fields = {name: self.rows[name][slots].tolist() for name in self.DTYPE.names}
+        return tuple(
+            {
+                'id': fields['id'][i],
+                'market_id': self.market_keys[fields['market_code'][i]],
+                'is_long_yes': fields['sign'][i] == 1,
+                'entry_price': fields['entry_price'][i],
+                'collateral': fields['collateral'][i],
+                'leverage': fields['leverage'][i],
+                'liq_price': fields['liq_price'][i],
+                'trader': self.traders[slot],
+                'timestamp': fields['timestamp'][i],
+            }
+            for i, slot in enumerate(slots)
+        )
+
+
+positions = PositionStore(min(1024, MAX_POSITIONS), MAX_POSITIONS)
+
+
+class LiquidationIndex:
+    """
+    Per-market heaps of open positions ordered by liquidation price
+    Longs liquidate once the price falls to their liq price, so they sit in
+    a max-heap (negated keys) and the most exposed one is always on top;
+    shorts use a min-heap. A tick pops only positions within LIQ_PRICE_EPS
+    of triggering (the exact PnL rule is applied by compute_liquidations),
+    and closed positions are dropped lazily when popped.
+    """
+    
+    def __init__(self):
+        self.long_heaps: Dict[Any, list] = {}   # market_id -> [(-liq_price, seq, position_id)]
+        self.short_heaps: Dict[Any, list] = {}  # market_id -> [(liq_price, seq, position_id)]
+        self.live: Dict[Any, Tuple[Any, int]] = {}  # position_id -> (market_id, seq)
+        self.market_counts: Dict[Any, int] = {}
+        self._seq = itertools.count()
+        self._dead = 0  # Stale heap entries not yet popped
+    
+    def add(self, position: 'Position'):
+        """Index a position (replaces an existing entry with the same id)"""
+        self.push(position.id, position.market_id, position.is_long_yes, position.liq_price)
+    
+    def push(self, position_id, market_id, is_long_yes: bool, liq_price: float):
+        """Index a position by its fields (used to re-queue unconfirmed candidates)"""
+        self.discard(position_id)
+        
+        seq = next(self._seq)
+        if is_long_yes:
+            heapq.heappush(self.long_heaps.setdefault(market_id, []), (-liq_price, seq, position_id))
+        else:
+            heapq.heappush(self.short_heaps.setdefault(market_id, []), (liq_price, seq, position_id))
+        self.live[position_id] = (market_id, seq)
+        self.market_counts[market_id] = self.market_counts.get(market_id, 0) + 1
+    
+    def discard(self, position_id):
+        """Drop a position; its heap entry is skipped when it surfaces"""
+        if self._unlink(position_id) is None:
+            return
+        self._dead += 1
+        if self._dead > 1024 and self._dead > len(self.live):
+            self._compact()
+    
+    def markets(self):
+        """Markets with at least one open position"""
+        return list(self.market_counts)
+    
+    def pop_candidates(self, market_id, price: float) -> list:
+        """Remove and return ids of positions that may liquidate at this price"""
+        triggered = []
+        
+        heap = self.long_heaps.get(market_id)
+        while heap and -heap[0][0] >= price - LIQ_PRICE_EPS:
+            _, seq, position_id = heapq.heappop(heap)
+            if self._claim(position_id, seq):
+                triggered.append(position_id)
+        
+        heap = self.short_heaps.get(market_id)
+        while heap and heap[0][0] <= price + LIQ_PRICE_EPS:
+            _, seq, position_id = heapq.heappop(heap)
+            if self._claim(position_id, seq):
+                triggered.append(position_id)
+        
+        return triggered
+    
+    def _claim(self, position_id, seq: int) -> bool:
+        """True if a popped heap entry is still live, unlinking it"""
+        entry = self.live.get(position_id)
+        if entry is None or entry[1] != seq:
+            self._dead -= 1
+            return False
+        self._unlink(position_id)
+        return True
+    
+    def _unlink(self, position_id):
+        entry = self.live.pop(position_id, None)
+        if entry is not None:
+            market_id = entry[0]
+            self.market_counts[market_id] -= 1
+            if not self.market_counts[market_id]:
+                del self.market_counts[market_id]
+        return entry
+    
+    def _compact(self):
+        """Rebuild the heaps without stale entries"""
+        for heaps in (self.long_heaps, self.short_heaps):
+            for market_id in list(heaps):
+                heap = [e for e in heaps[market_id] if self.live.get(e[2], (None, None))[1] == e[1]]
+                if heap:
+                    heapq.heapify(heap)
+                    heaps[market_id] = heap
+                else:
+                    del heaps[market_id]
+        self._dead = 0
+
+
+liquidation_index = LiquidationIndex()
+
+LIQUIDATION_THRESHOLD = -80.0  # PnL %
+
+def liquidation_price(entry_price: float, leverage: float, is_long_yes: bool) -> float:
+    """
+    Market price at which PnL hits LIQUIDATION_THRESHOLD
+    PnL % = sign * (price - entry) * leverage, solved for price.
+    """
+    sign = 1 if is_long_yes else -1
+    return entry_price + sign * LIQUIDATION_THRESHOLD / leverage
+
+# liq_price carries division rounding, so the heaps hand over anything this
+# close and compute_liquidations decides with the PnL formula itself
+LIQ_PRICE_EPS = 1e-9
+
+if njit is not None:
+    # No fastmath: IEEE semantics keep the inclusive threshold exact
+    @njit(cache=True)
+    def compute_liquidations(current, entry, leverage, sign, threshold):
+        """PnL % for a batch of rows and the liquidation mask (JIT-compiled)"""
+        n = current.shape[0]
+        pnl = np.empty(n, dtype=np.float64)
+        out = np.empty(n, dtype=np.bool_)
+        for i in range(n):
+            pnl[i] = sign[i] * (current[i] - entry[i]) * leverage[i]
+            out[i] = pnl[i] <= threshold
+        return pnl, out
+    
+    # Compile for the column dtypes now rather than on the first tick
+    _warm = np.zeros(1, dtype=np.float64)
+    compute_liquidations(_warm, _warm, _warm, np.zeros(1, dtype=np.int8), LIQUIDATION_THRESHOLD)
+else:
+    def compute_liquidations(current, entry, leverage, sign, threshold):
+        """
+        Vectorized PnL % for a batch of rows and the liquidation mask
+        float64 throughout, so the inclusive threshold matches scalar math.
+        """
+        pnl = sign * (current - entry) * leverage
+        return pnl, pnl <= threshold
+
+
+def parse_position_id(value) -> int:
+    """Integer position id; rejects bools and non-integral floats instead of truncating"""
+    if isinstance(value, bool):
+        raise TypeError("positionId must be an integer")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError("positionId must be an integer")
+    return int(value)
+
+
+@dataclass(slots=True, frozen=True)
+class Position:
+    """A leveraged position, validated once at ingress"""
+    id: int
+    market_id: Any  # Opaque key chosen by the frontend (market title)
+    is_long_yes: bool
+    entry_price: float
+    collateral: float
+    leverage: float
+    liq_price: float
+    trader: str
+    timestamp: float
+    
+    @classmethod
+    def from_payload(cls, data: dict) -> 'Position':
+        """
+        Coerce a /api/position/opened payload
+        Raises KeyError/TypeError/ValueError on missing or malformed fields.
+        """
+        is_long_yes = data['isLongYes']
+        if not isinstance(is_long_yes, bool):
+            raise TypeError("isLongYes must be a boolean")
+        
+        entry_price = float(data['entryPrice'])
+        collateral = float(data['collateral'])
+        leverage = float(data['leverage'])
+        if not all(map(math.isfinite, (entry_price, collateral, leverage))):
+            raise ValueError("entryPrice, collateral and leverage must be finite")
+        if not leverage >= 1:
+            raise ValueError("leverage must be >= 1")
+        
+        position_id = parse_position_id(data['positionId'])
+        if not 0 <= position_id <= PositionStore.MAX_ID:
+            raise ValueError("positionId out of range")
+        market_id = data['marketId']
+        if isinstance(market_id, bool) or not isinstance(market_id, (str, int)):
+            raise TypeError("marketId must be a string or integer")
+        
+        return cls(
+            id=position_id,
+            market_id=market_id,
+            is_long_yes=is_long_yes,
+            entry_price=entry_price,
+            collateral=collateral,
+            leverage=leverage,
+            liq_price=liquidation_price(entry_price, leverage, is_long_yes),
+            trader=str(data.get('trader') or ''),
+            timestamp=time.time(),
+        )
+    
+    @classmethod
+    def from_record(cls, record: dict) -> 'Position':
+        """
+        Rebuild a position persisted by store_position
+        Goes through from_payload so stored rows get the same validation;
+        liq_price is recomputed (older records don't carry it).
+        """
+        position = cls.from_payload({
+            'positionId': record['id'],
+            'marketId': record['market_id'],
+            'isLongYes': record['is_long_yes'],
+            'entryPrice': record['entry_price'],
+            'collateral': record['collateral'],
+            'leverage': record['leverage'],
+            'trader': record.get('trader'),
+        })
+        return replace(position, timestamp=float(record.get('timestamp', position.timestamp)))
+
 
 # Colors for terminal
 class Colors:
@@ -31,130 +494,317 @@ class Colors:
     MAGENTA = '\033[95m'
     RESET = '\033[0m'
 
-def log(message, color=Colors.RESET):
-    timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-    print(f"{color}[{timestamp}] {message}{Colors.RESET}")
+USE_COLOR = sys.stdout.isatty()
+
+# Line framing encoded once per color: b"<color>[" ... b"<reset>\n"
+_COLORS = [v for k, v in vars(Colors).items() if not k.startswith('_')]
+_PREFIX = {c: (c.encode() if USE_COLOR else b'') + b'[' for c in _COLORS}
+_SUFFIX = {c: (Colors.RESET.encode() if USE_COLOR else b'') + b'\n' for c in _COLORS}
+
+class ByteLineHandler(logging.Handler):
+    """
+    Writes pre-encoded log lines straight to stdout's byte buffer
+    Lines from the thread inside batch() are collected and written with a
+    single writelines() when the batch ends.
+    """
+    
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = stream or sys.stdout.buffer
+        self._sec = None
+        self._sec_bytes = b''
+        self._batch = None
+        self._batch_thread = None
+    
+    def emit(self, record):
+        try:
+            sec = int(record.created)
+            if sec != self._sec:
+                self._sec = sec
+                self._sec_bytes = time.strftime('%H:%M:%S', time.localtime(sec)).encode()
+            color = getattr(record, 'color', Colors.RESET)
+            line = b''.join((
+                _PREFIX[color], self._sec_bytes, b'.%03d] ' % record.msecs,
+                record.getMessage().encode(), _SUFFIX[color],
+            ))
+            if self._batch is not None and record.thread == self._batch_thread:
+                self._batch.append(line)
+            else:
+                self.stream.write(line)
+                self.stream.flush()
+        except Exception:
+            self.handleError(record)
+    
+    @contextmanager
+    def batch(self):
+        """Buffer this thread's lines and flush them in one write"""
+        self._batch, self._batch_thread = [], threading.get_ident()
+        try:
+            yield
+        finally:
+            lines, self._batch = self._batch, None
+            if lines:
+                with self.lock:
+                    self.stream.writelines(lines)
+                    self.stream.flush()
+
+logger = logging.getLogger("fulcrum")
+_handler = ByteLineHandler()
+logger.addHandler(_handler)
+logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+logger.propagate = False
+
+def log(message, color=Colors.RESET, level=logging.INFO):
+    logger.log(level, message, extra={'color': color})
 
 # Polymarket Oracle (simplified)
 def get_market_price(market_id):
     """Simulate getting market price - returns 50% for now"""
     return 50  # Simulated price
 
+PRICE_TTL = 5.0  # Seconds a fetched price is reused
+PRICE_CACHE_SIZE = 1024
+_price_cache: Dict[Any, Tuple[float, float]] = {}  # market_id -> (fetched_at, price)
+
+def get_cached_price(market_id):
+    """get_market_price with a short TTL cache (monitor thread only)"""
+    now = time.monotonic()
+    hit = _price_cache.get(market_id)
+    if hit and now - hit[0] < PRICE_TTL:
+        return hit[1]
+    
+    price = get_market_price(market_id)
+    if len(_price_cache) >= PRICE_CACHE_SIZE:
+        # Drop expired entries before growing further
+        for m in [m for m, (ts, _) in _price_cache.items() if now - ts >= PRICE_TTL]:
+            del _price_cache[m]
+    _price_cache[market_id] = (now, price)
+    return price
+
 # API Endpoints
 @app.route('/api/position/opened', methods=['POST'])
 def position_opened():
     """Receive position data from frontend"""
     try:
-        data = request.json
-        
-        position_id = data.get('positionId')
-        market_id = data.get('marketId')
-        is_long_yes = data.get('isLongYes')
-        entry_price = data.get('entryPrice')
-        collateral = data.get('collateral')
-        leverage = data.get('leverage')
-        trader = data.get('trader')
-        
+        position = Position.from_payload(request.get_json(silent=True))
+    except (KeyError, TypeError, ValueError) as e:
+        log(f"❌ Rejected position payload: {e}", Colors.RED)
+        return ojson({'status': 'error', 'message': f'Invalid position: {e}'}, 400)
+    
+    try:
         # Handle based on leverage
-        if leverage == 1:
+        if position.leverage == 1:
             log(f"🔄 SPOT TRADE (1x Leverage)", Colors.CYAN)
-            log(f"   Market: {market_id} | Side: {'YES' if is_long_yes else 'NO'}", Colors.CYAN)
+            log(f"   Market: {position.market_id} | Side: {'YES' if position.is_long_yes else 'NO'}", Colors.CYAN)
             log(f"   Initiating CCTP Bridge...\n", Colors.MAGENTA)
             # CCTP logic would go here (already implemented in frontend)
             
         else:
-            log(f"⚡ LEVERAGE TRADE ({leverage}x)", Colors.YELLOW)
-            log(f"   Position #{position_id} | Market: {market_id}", Colors.YELLOW)
-            log(f"   Entry: {entry_price}% | Collateral: {collateral}", Colors.YELLOW)
+            log(f"⚡ LEVERAGE TRADE ({position.leverage:g}x)", Colors.YELLOW)
+            log(f"   Position #{position.id} | Market: {position.market_id}", Colors.YELLOW)
+            log(f"   Entry: {position.entry_price:g}% | Collateral: {position.collateral:g}", Colors.YELLOW)
             
-            # Add to tracking
-            with position_lock:
-                active_positions.append({
-                    'id': position_id,
-                    'market_id': market_id,
-                    'is_long_yes': is_long_yes,
-                    'entry_price': entry_price,
-                    'collateral': float(collateral),
-                    'leverage': leverage,
-                    'trader': trader,
-                    'timestamp': time.time()
-                })
+            # Add to tracking (the monitor releases the slot on removal)
+            if not position_slots.acquire(blocking=False):
+                log(f"⚠️  Position #{position.id} rejected: MAX_POSITIONS ({MAX_POSITIONS}) reached", Colors.YELLOW)
+                return ojson({'status': 'error', 'message': 'Position capacity reached'}, 429)
+            pending_ops.put(('add', position))
+            wake_event.set()
             
-            log(f"✅ Position #{position_id} Tracked for Liquidation\n", Colors.GREEN)
+            log(f"✅ Position #{position.id} Tracked for Liquidation\n", Colors.GREEN)
         
-        return jsonify({'status': 'success', 'message': 'Position recorded'}), 200
+        return ojson({'status': 'success', 'message': 'Position recorded'}, 200)
         
     except Exception as e:
         log(f"❌ Error processing position: {e}", Colors.RED)
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        return ojson({'status': 'error', 'message': str(e)}, 500)
 
 @app.route('/api/position/closed', methods=['POST'])
 def position_closed():
     """Remove position from tracking when closed"""
     try:
-        data = request.json
-        position_id = data.get('positionId')
-        
-        with position_lock:
-            active_positions[:] = [p for p in active_positions if p['id'] != position_id]
+        position_id = parse_position_id(request.get_json(silent=True)['positionId'])
+    except (KeyError, TypeError, ValueError) as e:
+        return ojson({'status': 'error', 'message': f'Invalid positionId: {e}'}, 400)
+    
+    try:
+        pending_ops.put(('remove', position_id))
+        wake_event.set()
         
         log(f"🔴 Position #{position_id} Closed", Colors.CYAN)
-        return jsonify({'status': 'success'}), 200
+        return ojson({'status': 'success'}, 200)
         
     except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        return ojson({'status': 'error', 'message': str(e)}, 500)
 
 @app.route('/api/positions', methods=['GET'])
 def get_positions():
     """Return list of active positions"""
-    with position_lock:
-        # Return a copy to avoid race conditions
-        positions_copy = [p.copy() for p in active_positions]
-    return jsonify({'status': 'success', 'positions': positions_copy}), 200
+    # Published snapshot is immutable, so no lock or copy is needed
+    return ojson({'status': 'success', 'positions': positions_snapshot}, 200)
 
 # Liquidation Loop (background thread)
-def liquidation_monitor():
-    """Background thread to check for liquidations"""
-    log("🛡️  Liquidation Monitor Started", Colors.MAGENTA)
-    
+def apply_pending_ops() -> bool:
+    """
+    Drain queued add/remove ops into the monitor-owned position state
+    Returns True if any position was added.
+    """
+    global _generation
+    added = False
     while True:
         try:
-            time.sleep(10)  # Check every 10 seconds
-            
-            if not active_positions:
+            op, value = pending_ops.get_nowait()
+        except Empty:
+            return added
+        
+        if op in ('add', 'restore'):
+            replacing = value.id in positions
+            try:
+                positions.add(value)
+            except Exception as e:
+                position_slots.release()
+                log(f"❌ Could not track position #{value.id}: {e}", Colors.RED)
                 continue
-            
-            with position_lock:
-                positions_copy = active_positions.copy()
-            
-            for position in positions_copy:
-                # Get current market price
-                current_price = get_market_price(position['market_id'])
+            if replacing:
+                position_slots.release()  # Replaced an entry, no new slot used
+            liquidation_index.add(value)
+            if op == 'add':
+                store_position(value)
+            added = True
+        elif positions.remove(value):
+            position_slots.release()
+            liquidation_index.discard(value)
+            drop_position(value)
+        else:
+            continue
+        _generation += 1
+
+def publish_snapshot():
+    """Swap in a fresh immutable snapshot for API readers if state changed"""
+    global positions_snapshot, _published_generation
+    if _published_generation == _generation:
+        return
+    # Single reference assignment: readers see the old or new tuple, never a mix
+    positions_snapshot = positions.to_dicts()
+    _published_generation = _generation
+
+# Settlement I/O (Redis today, settle tx / trader notification later) runs
+# here so a slow network call never stalls the detection loop
+settle_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="liq")
+_pending_settlements = set()
+_pending_lock = threading.Lock()
+
+def settle_position(position: dict):
+    """Finish a liquidation off the monitor thread (runs once per position)"""
+    try:
+        drop_position(position['id'])
+        log(f"   Position #{position['id']} settled", Colors.RED, logging.DEBUG)
+    except Exception as e:
+        log(f"❌ Settlement failed for position #{position['id']}: {e}", Colors.RED)
+    finally:
+        with _pending_lock:
+            _pending_settlements.discard(position['id'])
+
+def submit_settlement(position: dict):
+    """Queue settle_position unless this position is already being settled"""
+    with _pending_lock:
+        if position['id'] in _pending_settlements:
+            return
+        _pending_settlements.add(position['id'])
+    settle_executor.submit(settle_position, position)
+
+def check_liquidations():
+    """Liquidate positions whose PnL is at or below the threshold"""
+    global _generation
+    # Get current market prices, one fetch per market with open positions
+    price_map = {m: get_cached_price(m) for m in liquidation_index.markets()}
+    
+    # Long YES liquidates at or below its liq price, shorts at or above;
+    # the heaps hand back only positions near or past that point
+    candidates = [
+        (position_id, current_price)
+        for market_id, current_price in price_map.items()
+        for position_id in liquidation_index.pop_candidates(market_id, current_price)
+    ]
+    if not candidates:
+        return
+    
+    # Popped but not yet liquidated or re-queued; put back if anything fails
+    undecided = {position_id for position_id, _ in candidates}
+    try:
+        # Gather the candidates' columns and apply the PnL rule in one batch
+        n = len(candidates)
+        slots = np.fromiter((positions.id_to_slot[pid] for pid, _ in candidates), dtype=np.intp, count=n)
+        current = np.fromiter((price for _, price in candidates), dtype=np.float64, count=n)
+        rows = positions.rows
+        pnl, liquidated = compute_liquidations(
+            current, rows.entry_price[slots], rows.leverage[slots], rows.sign[slots], LIQUIDATION_THRESHOLD
+        )
+        
+        with _handler.batch():
+            for i, (position_id, current_price) in enumerate(candidates):
+                row = rows[slots[i]]
+                market_id = positions.market_keys[int(row.market_code)]
+                if not liquidated[i]:
+                    # Within rounding of its liq price but not past the threshold yet
+                    liquidation_index.push(position_id, market_id, int(row.sign) == 1, float(row.liq_price))
+                    undecided.discard(position_id)
+                    continue
                 
-                # Calculate PnL
-                entry_price = position['entry_price']
-                leverage = position['leverage']
-                is_long_yes = position['is_long_yes']
+                position = {
+                    'id': position_id,
+                    'market_id': market_id,
+                    'is_long_yes': int(row.sign) == 1,
+                    'entry_price': float(row.entry_price),
+                    'leverage': float(row.leverage),
+                    'liq_price': float(row.liq_price),
+                    'current_price': current_price,
+                }
                 
-                # PnL calculation
-                if is_long_yes:
-                    price_change = current_price - entry_price
-                else:
-                    price_change = entry_price - current_price
+                if logger.isEnabledFor(logging.INFO):
+                    log(f"💀 LIQUIDATION TRIGGERED!", Colors.RED)
+                    log(f"   Position #{position_id} | PnL: {pnl[i]:.2f}%", Colors.RED)
+                    log(f"   Entry: {position['entry_price']:g}% | Current: {current_price:g}%", Colors.YELLOW)
                 
-                pnl_pct = (price_change / 100) * leverage * 100
+                # Remove from tracking
+                positions.remove(position_id)
+                undecided.discard(position_id)
+                position_slots.release()
+                _generation += 1
+                submit_settlement(position)
                 
-                # Check for liquidation (PnL <= -80%)
-                if pnl_pct <= -80:
-                    log(f"💀 LIQUIDATION TRIGGERED!", Colors.RED)
-                    log(f"   Position #{position['id']} | PnL: {pnl_pct:.2f}%", Colors.RED)
-                    log(f"   Entry: {entry_price}% | Current: {current_price}%", Colors.YELLOW)
-                    
-                    # Remove from tracking
-                    with position_lock:
-                        active_positions[:] = [p for p in active_positions if p['id'] != position['id']]
-                    
-                    log(f"   Position liquidated and removed from tracking\n", Colors.RED)
+                log(f"   Position liquidated and removed from tracking\n", Colors.RED)
+    finally:
+        for position_id in undecided:
+            if position_id in positions:
+                row = positions.row(position_id)
+                liquidation_index.push(
+                    position_id, positions.market_keys[int(row.market_code)],
+                    int(row.sign) == 1, float(row.liq_price)
+                )
+
+def liquidation_monitor():
+    """Background thread to check for liquidations (sole writer of position state)"""
+    log("🛡️  Liquidation Monitor Started", Colors.MAGENTA)
+    
+    next_check_ts = time.monotonic() + CHECK_INTERVAL
+    
+    while True:
+        try:
+            # Sleep until the next price check is due, or indefinitely when
+            # nothing is tracked; new ops wake us early either way
+            timeout = max(0.0, next_check_ts - time.monotonic()) if len(positions) else None
+            wake_event.wait(timeout)
+            wake_event.clear()
+            
+            added = apply_pending_ops()
+            
+            # Check right away for new positions, otherwise every CHECK_INTERVAL
+            now = time.monotonic()
+            if len(positions) and (added or now >= next_check_ts):
+                check_liquidations()
+                next_check_ts = now + CHECK_INTERVAL
+            publish_snapshot()
                     
         except Exception as e:
             log(f"❌ Liquidation monitor error: {e}", Colors.RED)
@@ -170,18 +820,22 @@ def print_banner():
                                                                                                    
            Webhook-Based Leverage System - Fast & Simple
     """
-    print(f"{Colors.CYAN}{banner}{Colors.RESET}\n")
+    print(f"{Colors.CYAN}{banner}{Colors.RESET}\n" if USE_COLOR else f"{banner}\n")
 
-if __name__ == '__main__':
-    print_banner()
+def start_monitor():
+    """Restore persisted positions and start the liquidation monitor"""
+    # Pick up positions persisted by a previous run
+    restore_positions()
     
     # Start liquidation monitor in background
     monitor_thread = threading.Thread(target=liquidation_monitor, daemon=True)
     monitor_thread.start()
     
-    # Start Flask API
-    log("🚀 Starting Flask API Server...", Colors.GREEN)
-    log("📡 Listening on http://localhost:5001", Colors.CYAN)
-    log("⏱️  Liquidation checks every 10s\n", Colors.YELLOW)
-    
-    app.run(host='0.0.0.0', port=5001, debug=False)
+    log("🚀 Flask API Server ready", Colors.GREEN)
+    log(f"⏱️  Liquidation checks every {CHECK_INTERVAL}s\n", Colors.YELLOW)
+
+if __name__ == '__main__':
+    # Serve through gunicorn (see gunicorn.conf.py) rather than the Werkzeug dev server
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    # Same interpreter as this script, so it works without an activated venv / on Windows
+    os.execv(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'webhook_agent:app'])